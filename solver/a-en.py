@@ -1,63 +1,102 @@
 import numpy as np
-import copy
 import sys
-from itertools import permutations
-import os
-from collections import deque
 import time
-import heapq
-
-class Island:
-    def __init__(self, row, col, is_island, value, bridges):
-        self.row = row
-        self.col = col
-        self.is_island = is_island
-        self.value = value
-        self.bridges = bridges
-
-    def __lt__(self, other):
-        return self.value > other.value
-
-
-def find_solution(board, viable_moves):
-    moves = []
-    bad_moves = []
-    board_states = []
-    for perm in permutations(viable_moves):
-        board_copy = copy.deepcopy(board)
-        move_queue = deque(perm)
-        for move in move_queue:
-            island1, island2 = move
-            valid = perform_move(board_copy, island1.row, island1.col, island2.row, island2.col)
-            if valid:
-                moves.append([island1.row, island1.col, island2.row, island2.col])
-            else:
-                bad_moves.append((island1, island2))
-            if is_winner(board_copy):
-                return moves
-        if bad_moves:
-            for island1, island2 in bad_moves:
-                valid = perform_move(board_copy, island1.row, island1.col, island2.row, island2.col)
-                if valid:
-                    moves.append([island1.row, island1.col, island2.row, island2.col])
-        if is_winner(board_copy):
-            return moves
-        else:
-            print_board(board_copy)
-            board_states.append(board_copy)
-            moves.clear()
-            sys.exit(0)
-    return None
+import argparse
+
+MAX_BRIDGES = 2
+LEFT, RIGHT, UP, DOWN = 0, 1, 2, 3
+# Codes for what is drawn on a water cell, only turned into characters by render_board
+EMPTY, H1, H2, V1, V2 = 0, 1, 2, 3, 4
+CODE_TO_CHAR = '.-=|"'
+# Code for a horizontal / vertical segment indexed by its bridge count
+H_GLYPH = np.array([EMPTY, H1, H2], dtype=np.int8)
+V_GLYPH = np.array([EMPTY, V1, V2], dtype=np.int8)
+
+
+def try_place(is_island, value, bridges, glyph, r1, c1, r2, c2, log):
+    # Add one bridge only if both islands still have capacity
+    if bridges[r1, c1] >= value[r1, c1] or bridges[r2, c2] >= value[r2, c2]:
+        return False
+    return perform_move(is_island, value, bridges, glyph, r1, c1, r2, c2, log)
 
 
-def is_winner(board):
-    rows, cols = board.shape
-    islands = [board[i, j] for i in range(rows) for j in range(cols) if board[i, j].is_island]
-    return all(isl.bridges == isl.value for isl in islands)
+def undo_connect(bridges, glyph, log, mark=0):
+    # Restore every cell recorded in log since position mark
+    while len(log) > mark:
+        r, c, old_bridges, old_glyph = log.pop()
+        bridges[r, c] = old_bridges
+        glyph[r, c] = old_glyph
+
+
+def forward_check(value, bridges, island_edges, idx, row, col):
+    # Missing bridges must still fit in the island's moves left to decide (index >= idx)
+    room = 0
+    for k, r, c in island_edges[row, col]:
+        if k >= idx:
+            room += min(MAX_BRIDGES, value[r, c] - bridges[r, c])
+    return value[row, col] - bridges[row, col] <= room
+
+
+def solve_bt(is_island, value, bridges, glyph, moves, island_edges, idx, assignment, count, log, islands, island_caps):
+    # assignment[:count] holds the bridges drawn so far; returns the final count, or -1 if stuck
+    if idx == len(moves):
+        return count if is_winner(bridges, islands, island_caps) else -1
+    r1, c1, r2, c2 = moves[idx]
+    mark, placed = len(log), 0
+    while True:
+        if forward_check(value, bridges, island_edges, idx + 1, r1, c1) and forward_check(value, bridges, island_edges, idx + 1, r2, c2):
+            found = solve_bt(is_island, value, bridges, glyph, moves, island_edges, idx + 1, assignment, count + placed, log,
+                             islands, island_caps)
+            if found >= 0:
+                return found
+        if placed == MAX_BRIDGES or not try_place(is_island, value, bridges, glyph, r1, c1, r2, c2, log):
+            break
+        assignment[count + placed] = (r1, c1, r2, c2)
+        placed += 1
+    undo_connect(bridges, glyph, log, mark)
+    return -1
+
+
+def find_solution(is_island, value, bridges, glyph, viable_moves, island_edges):
+    # Searches on the board itself and puts every cell back before returning
+    # island_edges[r, c] lists (move index, other row, other col) for each move touching island (r, c)
+    # Each move draws at most MAX_BRIDGES bridges, so the answer fits in a fixed array
+    moves = np.empty((len(viable_moves) * MAX_BRIDGES, 4), dtype=np.int16)
+    log = []
+    islands, island_caps = find_islands(is_island, value)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 2 * len(viable_moves) + 100))
+    moves_len = solve_bt(is_island, value, bridges, glyph, viable_moves, island_edges, 0, moves, 0, log, islands, island_caps)
+    undo_connect(bridges, glyph, log)
+    return moves[:moves_len] if moves_len >= 0 else None
+
+
+def find_islands(is_island, value):
+    # Island coordinates and capacities never change, so is_winner only has to look at these
+    islands = np.argwhere(is_island).astype(np.int32)
+    return islands, value[islands[:, 0], islands[:, 1]]
+
+
+def is_winner(bridges, islands, island_caps):
+    return np.array_equal(bridges[islands[:, 0], islands[:, 1]], island_caps)
+
+
+def expand_grid(grid):
+    # Add an empty row / column between every pair of touching islands so a bridge fits
+    # grid holds island values with -1 for water; rows and columns are placed in one scatter
+    land = grid >= 0
+    row_gap = (land[:-1] & land[1:]).any(axis=1)
+    col_gap = (land[:, :-1] & land[:, 1:]).any(axis=0)
+    row_map = np.arange(grid.shape[0]) + np.concatenate(([0], np.cumsum(row_gap)))
+    col_map = np.arange(grid.shape[1]) + np.concatenate(([0], np.cumsum(col_gap)))
+    expanded = np.full((row_map[-1] + 1, col_map[-1] + 1), -1, dtype=grid.dtype)
+    expanded[np.ix_(row_map, col_map)] = grid
+    return expanded
 
 
 def create_board(file_path):
     # Read puzzle file: blank spots as '.', islands as digits or 'a'/'b'/'c' for 10/11/12
+    # The board is four parallel arrays: is_island, value (island capacity),
+    # bridges (on an island: bridges built, on water: bridges drawn) and glyph (symbol drawn)
     with open(file_path, 'r') as f:
         n, m = map(int, f.readline().split(','))
         temp = []
@@ -68,7 +107,7 @@ def create_board(file_path):
             row = []
             for j, ch in enumerate(chars):
                 if ch == '.':
-                    row.append(Island(i, j, False, '.', 0))
+                    row.append(-1)
                 else:
                     if ch.isdigit():
                         val = int(ch)
@@ -76,194 +115,180 @@ def create_board(file_path):
                         val = mapping[ch]
                     else:
                         raise ValueError(f"Invalid character in board: {ch}")
-                    row.append(Island(i, j, True, val, 0))
+                    row.append(val)
             temp.append(row)
     # Expand grid for bridge placement
-    expanded = []
-    for i in range(n):
-        expanded.append(temp[i])
-        for j in range(m):
-            if i < n - 1 and temp[i][j].is_island and temp[i+1][j].is_island:
-                gap_row = [Island(i, j, False, '.', 0) for _ in range(len(temp[0]))]
-                expanded.append(gap_row)
-                break
-    for i in range(len(expanded)):
-        for j in range(len(expanded[i])):
-            if j < len(expanded[i]) - 1 and expanded[i][j].is_island and expanded[i][j+1].is_island:
-                for k in range(len(expanded)):
-                    expanded[k].insert(j+1, Island(i, j, False, '.', 0))
-                break
-    board = np.array(expanded)
-    update_positions(board)
-    return board
-
-
-def connect_islands(board, island1, island2, is_human=False):
+    grid = expand_grid(np.array(temp, dtype=np.int8))
+    is_island = grid >= 0
+    value = np.where(is_island, grid, 0).astype(np.int8)
+    bridges = np.zeros(grid.shape, dtype=np.int8)
+    glyph = np.full(grid.shape, EMPTY, dtype=np.int8)
+    return is_island, value, bridges, glyph
+
+
+def connect_islands(value, bridges, glyph, r1, c1, r2, c2, is_human=False, log=None):
+    # log, when given, collects (row, col, old bridges, old glyph) for every cell changed
     # Prevent exceeding allowed bridges
-    for isl in (island1, island2):
-        if isl.bridges == isl.value:
+    for r, c in ((r1, c1), (r2, c2)):
+        if bridges[r, c] == value[r, c]:
             if is_human:
                 print("Maximum number of bridges reached")
             return
     # Horizontal
-    if island1.row == island2.row:
-        row = island1.row
-        step = 1 if island1.col < island2.col else -1
-        start = island1.col + step
-        end = island2.col
-        if board[row, start].bridges == 2:
+    if r1 == r2:
+        step = 1 if c1 < c2 else -1
+        start = c1 + step
+        if bridges[r1, start] == 2:
             if is_human:
                 print("Already two bridges")
             return
-        for c in range(start, end, step):
-            if board[row, c].bridges % 2 == 0:
-                board[row, c].bridges = 1
-                board[row, c].value = '-'
-            else:
-                board[row, c].bridges = 2
-                board[row, c].value = '='
+        for c in range(start, c2, step):
+            if log is not None:
+                log.append((r1, c, bridges[r1, c], glyph[r1, c]))
+            bridges[r1, c] = 1 if bridges[r1, c] % 2 == 0 else 2
+            glyph[r1, c] = H_GLYPH[bridges[r1, c]]
     # Vertical
-    if island1.col == island2.col:
-        col = island1.col
-        step = 1 if island1.row < island2.row else -1
-        start = island1.row + step
-        end = island2.row
-        if board[start, col].bridges == 2:
+    if c1 == c2:
+        step = 1 if r1 < r2 else -1
+        start = r1 + step
+        if bridges[start, c1] == 2:
             if is_human:
                 print("Already two bridges")
             return
-        for r in range(start, end, step):
-            if board[r, col].bridges % 2 == 0:
-                board[r, col].bridges = 1
-                board[r, col].value = '|'  
-            else:
-                board[r, col].bridges = 2
-                board[r, col].value = '║'
-    island1.bridges += 1
-    island2.bridges += 1
+        for r in range(start, r2, step):
+            if log is not None:
+                log.append((r, c1, bridges[r, c1], glyph[r, c1]))
+            bridges[r, c1] = 1 if bridges[r, c1] % 2 == 0 else 2
+            glyph[r, c1] = V_GLYPH[bridges[r, c1]]
+    for r, c in ((r1, c1), (r2, c2)):
+        if log is not None:
+            log.append((r, c, bridges[r, c], glyph[r, c]))
+        bridges[r, c] += 1
 
 
-def check_islands(board, island1, island2, is_human=False):
+def check_islands(is_island, r1, c1, r2, c2, is_human=False):
     # Ensure no other island between two
-    if island1.row == island2.row:
-        step = 1 if island1.col < island2.col else -1
-        for c in range(island1.col + step, island2.col, step):
-            if board[island1.row, c].is_island:
-                if is_human:
-                    print("Island in the way")
-                return False
-        return True
-    if island1.col == island2.col:
-        step = 1 if island1.row < island2.row else -1
-        for r in range(island1.row + step, island2.row, step):
-            if board[r, island1.col].is_island:
-                if is_human:
-                    print("Island in the way")
-                return False
+    if r1 == r2 or c1 == c2:
+        if segment(is_island, r1, c1, r2, c2).any():
+            if is_human:
+                print("Island in the way")
+            return False
         return True
     if is_human:
         print("Cannot connect these islands")
     return False
 
 
-def update_positions(board):
-    rows, cols = board.shape
-    for i in range(rows):
-        for j in range(cols):
-            board[i, j].row = i
-            board[i, j].col = j
+def segment(grid, r1, c1, r2, c2):
+    # View of the cells strictly between two islands on the same row or column
+    if r1 == r2:
+        return grid[r1, min(c1, c2) + 1:max(c1, c2)]
+    return grid[min(r1, r2) + 1:max(r1, r2), c1]
 
 
-def validate_row(board, island1, island2, bridges):
-    step = 1 if island1.col < island2.col else -1
-    symbol = '-' if bridges == 1 else '.'
-    for c in range(island1.col + step, island2.col, step):
-        if board[island1.row, c].value != symbol:
-            return False
-    return True
+def validate_row(glyph, r1, c1, r2, c2, bridges):
+    symbol = H1 if bridges == 1 else EMPTY
+    return bool((segment(glyph, r1, c1, r2, c2) == symbol).all())
 
 
-def validate_col(board, island1, island2, bridges):
-    step = 1 if island1.row < island2.row else -1
-    symbol = '|' if bridges == 1 else '.'
-    for r in range(island1.row + step, island2.row, step):
-        if board[r, island1.col].value != symbol:
-            return False
-    return True
+def validate_col(glyph, r1, c1, r2, c2, bridges):
+    symbol = V1 if bridges == 1 else EMPTY
+    return bool((segment(glyph, r1, c1, r2, c2) == symbol).all())
 
 
-def perform_move(board, row1, col1, row2, col2):
+def perform_move(is_island, value, bridges, glyph, row1, col1, row2, col2, log=None, is_human=False):
     valid = False
-    cell1 = board[row1, col1]
-    cell2 = board[row2, col2]
-    if cell1.is_island and cell2.is_island:
-        if check_islands(board, cell1, cell2):
+    if is_island[row1, col1] and is_island[row2, col2]:
+        if check_islands(is_island, row1, col1, row2, col2):
             # Next cell determines existing bridges
-            if cell1.row == cell2.row:
-                next_cell = board[cell1.row, cell1.col + (1 if cell1.col < cell2.col else -1)]
-                valid = validate_row(board, cell1, cell2, next_cell.bridges)
+            if row1 == row2:
+                existing = bridges[row1, col1 + (1 if col1 < col2 else -1)]
+                valid = validate_row(glyph, row1, col1, row2, col2, existing)
             else:
-                next_cell = board[cell1.row + (1 if cell1.row < cell2.row else -1), cell1.col]
-                valid = validate_col(board, cell1, cell2, next_cell.bridges)
+                existing = bridges[row1 + (1 if row1 < row2 else -1), col1]
+                valid = validate_col(glyph, row1, col1, row2, col2, existing)
             if valid:
-                connect_islands(board, cell1, cell2)
+                connect_islands(value, bridges, glyph, row1, col1, row2, col2, is_human, log)
     return valid
 
 
-def print_board(board):
-    os.system('clear')
-    rows, cols = board.shape
+def render_board(is_island, value, glyph):
+    rows, cols = is_island.shape
+    lines = []
     for i in range(rows):
+        # Plain lists per row, indexing them is much cheaper than numpy scalar lookups
+        land, caps, codes = is_island[i].tolist(), value[i].tolist(), glyph[i].tolist()
+        cells = []
         for j in range(cols):
-            print(f"  {board[i, j].value}  ", end="")
-        print()
-    time.sleep(1)
+            cell = caps[j] if land[j] else CODE_TO_CHAR[codes[j]]
+            cells.append(f"  {cell}  ")
+        lines.append("".join(cells))
+    return "\n".join(lines)
 
 
-def move(board, row1, col1, row2, col2, is_human=False):
-    if board[row1, col1].is_island and board[row2, col2].is_island:
-        if check_islands(board, board[row1, col1], board[row2, col2], is_human):
-            if perform_move(board, row1, col1, row2, col2):
-                connect_islands(board, board[row1, col1], board[row2, col2], is_human)
+def animate(is_island, value, glyph, delay=1):
+    # Clear the terminal with ANSI codes rather than forking `clear`
+    sys.stdout.write("\x1b[2J\x1b[H" + render_board(is_island, value, glyph) + "\n")
+    sys.stdout.flush()
+    time.sleep(delay)
+
+
+def move(is_island, value, bridges, glyph, row1, col1, row2, col2, is_human=False):
+    if is_island[row1, col1] and is_island[row2, col2]:
+        if check_islands(is_island, row1, col1, row2, col2, is_human):
+            # perform_move draws the bridge, is_human only turns on the messages
+            perform_move(is_island, value, bridges, glyph, row1, col1, row2, col2, is_human=is_human)
     else:
         print("No island at given coordinates")
 
 
-def automatic(board):
+def find_neighbors(islands):
+    # nbr[k, d] is the first island LEFT, RIGHT, UP and DOWN of island k, -1 if none
+    # islands are in row-major order so horizontal neighbours sit next to each other
+    nbr = np.full((len(islands), 4), -1, dtype=np.int32)
+    k = np.flatnonzero(islands[1:, 0] == islands[:-1, 0])
+    nbr[k, RIGHT] = k + 1
+    nbr[k + 1, LEFT] = k
+    # and so do vertical neighbours once sorted by column
+    order = np.lexsort((islands[:, 0], islands[:, 1])).astype(np.int32)
+    k = np.flatnonzero(islands[order[1:], 1] == islands[order[:-1], 1])
+    nbr[order[k], DOWN] = order[k + 1]
+    nbr[order[k + 1], UP] = order[k]
+    return nbr
+
+
+def automatic(is_island, value, bridges, glyph):
+    islands, _ = find_islands(is_island, value)
+    nbr = find_neighbors(islands)
+    coords = islands.tolist()
+    # One move per pair of neighbours, and each island's moves so forward_check only looks at those
     possible_moves = []
-    rows, cols = board.shape
-    for i in range(rows):
-        for j in range(cols):
-            if board[i, j].is_island:
-                # horizontal neighbors
-                line = board[i, :]
-                left, right = line[:j], line[j:]
-                for k in range(len(left)-1, -1, -1):
-                    if left[k].is_island:
-                        possible_moves.append((board[i, j], left[k]))
-                        break
-                for neighbor in right:
-                    if neighbor.is_island and neighbor.col != j:
-                        possible_moves.append((board[i, j], neighbor))
-                        break
-                # vertical neighbors
-                col_line = board[:, j]
-                up, down = col_line[:i], col_line[i:]
-                for k in range(len(up)-1, -1, -1):
-                    if up[k].is_island:
-                        possible_moves.append((board[i, j], up[k]))
-                        break
-                for neighbor in down:
-                    if neighbor.is_island and neighbor.row != i:
-                        possible_moves.append((board[i, j], neighbor))
-                        break
-    return find_solution(copy.deepcopy(board), possible_moves)
+    island_edges = {tuple(rc): [] for rc in coords}
+    for i in range(len(coords)):
+        for d in range(4):
+            j = nbr[i, d]
+            if j > i:
+                island_edges[tuple(coords[i])].append((len(possible_moves), *coords[j]))
+                island_edges[tuple(coords[j])].append((len(possible_moves), *coords[i]))
+                possible_moves.append((*coords[i], *coords[j]))
+    return find_solution(is_island, value, bridges, glyph, possible_moves, island_edges)
 
 
 if __name__ == "__main__":
-    board = create_board("islands.in")
-    print_board(board)
-    rows, cols = board.shape
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--animate", action="store_true", help="redraw the board after every move")
+    args = parser.parse_args()
+
+    def show():
+        if args.animate:
+            animate(is_island, value, glyph)
+        else:
+            print(render_board(is_island, value, glyph))
+
+    is_island, value, bridges, glyph = create_board("islands.in")
+    islands, island_caps = find_islands(is_island, value)
+    show()
+    rows, cols = is_island.shape
     is_human = False
     print("Automatic (1)")
     print("Human (2)")
@@ -277,24 +302,25 @@ if __name__ == "__main__":
     while True:
         try:
             if is_human:
-                print_board(board)
+                show()
                 coords = list(map(int, input("Enter coords row1,col1,row2,col2: ").split(',')))
                 if len(coords) != 4:
                     raise ValueError("Enter 4 comma-separated numbers")
                 if any(c < 0 or c >= rows for c in (coords[0], coords[2])) or any(c < 0 or c >= cols for c in (coords[1], coords[3])):
                     raise ValueError("Invalid coordinates")
-                move(board, *coords, True)
+                move(is_island, value, bridges, glyph, *coords, True)
             else:
-                solution = automatic(board)
-                if solution is not None:
-                    for step in solution:
-                        print_board(board)
-                        move(board, step[0], step[1], step[2], step[3])
-                else:
+                solution = automatic(is_island, value, bridges, glyph)
+                if solution is None:
                     print("No solution")
+                    break
+                for step in solution:
+                    perform_move(is_island, value, bridges, glyph, *step)
+                    if args.animate:
+                        show()
         except ValueError as e:
             print(e)
-        if is_winner(board):
-            print_board(board)
+        if is_winner(bridges, islands, island_caps):
+            show()
             print("You win!")
             break
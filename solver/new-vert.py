@@ -1,33 +1,50 @@
 import numpy as np
-import copy
+from numba import njit
+import os
 import sys
-from itertools import permutations
-from collections import deque
-import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
 
-class Island:
-    def __init__(self, row, col, is_island, value, bridges=0):
-        self.row = row
-        self.col = col
-        self.is_island = is_island
-        self.value = value
-        self.bridges = bridges
+MAX_BRIDGES = 3
+# neighbour directions, d ^ 1 is the opposite direction
+LEFT, RIGHT, UP, DOWN = 0, 1, 2, 3
+# slots in each search worker's table of dead states, must be a power of two
+DEAD_SLOTS = 1 << 20
 
-    def __lt__(self, other):
-        return self.value > other.value
+ALL_BITS = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# codes for what is drawn on a water cell, only turned into characters when printing
+EMPTY, H1, H2, H3, V1, V2, V3 = 0, 1, 2, 3, 4, 5, 6
+CODE_TO_CHAR = '.-=E|"#'
+# code for a horizontal / vertical segment indexed by its bridge count
+H_GLYPH = np.array([EMPTY, H1, H2, H3], dtype=np.int8)
+V_GLYPH = np.array([EMPTY, V1, V2, V3], dtype=np.int8)
+
+
+def expand_grid(grid):
+    # add an empty row / column between every pair of touching islands so a bridge fits
+    # grid holds island values with -1 for water; rows and columns are placed in one scatter
+    land = grid >= 0
+    row_gap = (land[:-1] & land[1:]).any(axis=1)
+    col_gap = (land[:, :-1] & land[:, 1:]).any(axis=0)
+    row_map = np.arange(grid.shape[0]) + np.concatenate(([0], np.cumsum(row_gap)))
+    col_map = np.arange(grid.shape[1]) + np.concatenate(([0], np.cumsum(col_gap)))
+    expanded = np.full((row_map[-1] + 1, col_map[-1] + 1), -1, dtype=grid.dtype)
+    expanded[np.ix_(row_map, col_map)] = grid
+    return expanded
 
 
 def read_board_stdin():
+    # board is held as parallel arrays: is_island, value (island capacity),
+    # bridges (bridges on an island / segments on a water cell), glyph (drawn symbol)
     lines = [line.rstrip('\n') for line in sys.stdin if line.strip()]
-    n = len(lines)
-    m = len(lines[0]) if n else 0
     temp = []
     mapping = {'a': 10, 'b': 11, 'c': 12}
     for i, line in enumerate(lines):
         row = []
         for j, ch in enumerate(line):
             if ch == '.':
-                row.append(Island(i, j, False, '.'))
+                row.append(-1)
             else:
                 if ch.isdigit():
                     val = int(ch)
@@ -35,128 +52,360 @@ def read_board_stdin():
                     val = mapping[ch]
                 else:
                     raise ValueError(f"Invalid character: {ch}")
-                row.append(Island(i, j, True, val))
+                row.append(val)
         temp.append(row)
-    expanded = []
-    for i in range(n):
-        expanded.append(temp[i])
-        for j in range(m):
-            if i < n-1 and temp[i][j].is_island and temp[i+1][j].is_island:
-                gap = [Island(i, j, False, '.') for _ in range(m)]
-                expanded.append(gap)
-                break
-    for i in range(len(expanded)):
-        for j in range(len(expanded[0]) - 1):
-            if expanded[i][j].is_island and expanded[i][j+1].is_island:
-                for row in expanded:
-                    row.insert(j+1, Island(i, j, False, '.'))
-                break
-    board = np.array(expanded)
-    update_positions(board)
-    return board
-
-
-def update_positions(board):
-    rows, cols = board.shape
-    for i in range(rows):
-        for j in range(cols):
-            board[i, j].row = i
-            board[i, j].col = j
-
-
-def check_clear(board, i1, i2, existing):
-    # existing: number of bridges already present between these islands
-    if i1.row == i2.row:
-        step = 1 if i1.col < i2.col else -1
-        sym = {1: '-', 2: '=', 3: 'E'}.get(existing, None)
-        for c in range(i1.col+step, i2.col, step):
-            if board[i1.row, c].value not in ('.', sym):
-                return False
-        return True
-    if i1.col == i2.col:
-        step = 1 if i1.row < i2.row else -1
-        sym = {1: '|', 2: '║', 3: '#'}.get(existing, None)
-        for r in range(i1.row+step, i2.row, step):
-            if board[r, i1.col].value not in ('.', sym):
-                return False
-        return True
+    grid = expand_grid(np.array(temp, dtype=np.int8))
+    is_island = grid >= 0
+    value = np.where(is_island, grid, 0).astype(np.int8)
+    bridges = np.zeros(grid.shape, dtype=np.int8)
+    glyph = np.full(grid.shape, EMPTY, dtype=np.int8)
+    return is_island, value, bridges, glyph
+
+
+@njit(cache=True, nogil=True)
+def _set_bit_nb(words, i, j, on):
+    # words[i] is a bitset over j, spread across uint64 words
+    bit = np.uint64(1) << np.uint64(j & 63)
+    if on:
+        words[i, j >> 6] |= bit
+    else:
+        words[i, j >> 6] &= ~bit
+
+
+@njit(cache=True, nogil=True)
+def _any_bits_nb(words, i, lo, hi):
+    # is any bit in [lo, hi) of words[i] set
+    if lo >= hi:
+        return False
+    for w in range(lo >> 6, ((hi - 1) >> 6) + 1):
+        start = max(lo, w << 6) - (w << 6)
+        end = min(hi, (w + 1) << 6) - (w << 6)
+        mask = (ALL_BITS >> np.uint64(64 - (end - start))) << np.uint64(start)
+        if words[i, w] & mask:
+            return True
+    return False
+
+
+@njit(cache=True, nogil=True)
+def _check_clear_nb(row_v, col_h, r1, c1, r2, c2):
+    # a bridge between neighbours is only blocked by a bridge crossing it:
+    # row_v[r] marks the columns with a vertical bridge on row r, col_h[c] the rows with a horizontal one
+    if r1 == r2:
+        return not _any_bits_nb(row_v, r1, min(c1, c2) + 1, max(c1, c2))
+    if c1 == c2:
+        return not _any_bits_nb(col_h, c1, min(r1, r2) + 1, max(r1, r2))
     return False
 
 
-def connect(board, i1, i2):
-    # draw one more bridge segment and symbol
-    if i1.row == i2.row:
-        step = 1 if i1.col < i2.col else -1
-        for c in range(i1.col+step, i2.col, step):
-            cell = board[i1.row, c]
-            if cell.bridges < 3:
-                cell.bridges += 1
-                cell.value = {1: '-', 2: '=', 3: 'E'}[cell.bridges]
+@njit(cache=True, nogil=True)
+def _connect_nb(bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2):
+    # draw one more bridge segment and symbol, keeping state[0] the board's zobrist hash
+    if r1 == r2:
+        step = 1 if c1 < c2 else -1
+        for c in range(c1+step, c2, step):
+            if bridges[r1, c] < 3:
+                state[0] ^= zobrist[r1, c, 0, bridges[r1, c]] ^ zobrist[r1, c, 0, bridges[r1, c] + 1]
+                bridges[r1, c] += 1
+                glyph[r1, c] = H_GLYPH[bridges[r1, c]]
+                if bridges[r1, c] == 1:
+                    _set_bit_nb(col_h, c, r1, True)
+    else:
+        step = 1 if r1 < r2 else -1
+        for r in range(r1+step, r2, step):
+            if bridges[r, c1] < 3:
+                state[0] ^= zobrist[r, c1, 1, bridges[r, c1]] ^ zobrist[r, c1, 1, bridges[r, c1] + 1]
+                bridges[r, c1] += 1
+                glyph[r, c1] = V_GLYPH[bridges[r, c1]]
+                if bridges[r, c1] == 1:
+                    _set_bit_nb(row_v, r, c1, True)
+    bridges[r1, c1] += 1
+    bridges[r2, c2] += 1
+
+
+@njit(cache=True, nogil=True)
+def _undo_nb(bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2):
+    # remove the last bridge drawn by _try_place_nb
+    if r1 == r2:
+        step = 1 if c1 < c2 else -1
+        for c in range(c1+step, c2, step):
+            state[0] ^= zobrist[r1, c, 0, bridges[r1, c]] ^ zobrist[r1, c, 0, bridges[r1, c] - 1]
+            bridges[r1, c] -= 1
+            glyph[r1, c] = H_GLYPH[bridges[r1, c]]
+            if bridges[r1, c] == 0:
+                _set_bit_nb(col_h, c, r1, False)
     else:
-        step = 1 if i1.row < i2.row else -1
-        for r in range(i1.row+step, i2.row, step):
-            cell = board[r, i1.col]
-            if cell.bridges < 3:
-                cell.bridges += 1
-                cell.value = {1: '|', 2: '║', 3: '#'}[cell.bridges]
-    i1.bridges += 1
-    i2.bridges += 1
+        step = 1 if r1 < r2 else -1
+        for r in range(r1+step, r2, step):
+            state[0] ^= zobrist[r, c1, 1, bridges[r, c1]] ^ zobrist[r, c1, 1, bridges[r, c1] - 1]
+            bridges[r, c1] -= 1
+            glyph[r, c1] = V_GLYPH[bridges[r, c1]]
+            if bridges[r, c1] == 0:
+                _set_bit_nb(row_v, r, c1, False)
+    bridges[r1, c1] -= 1
+    bridges[r2, c2] -= 1
+
+
+def find_neighbors(islands):
+    # nbr[k, d]: index of the first island LEFT, RIGHT, UP and DOWN of island k, -1 if none
+    # islands is in row-major order, so horizontal neighbours are consecutive entries
+    nbr = np.full((len(islands), 4), -1, dtype=np.int32)
+    k = np.flatnonzero(islands[1:, 0] == islands[:-1, 0])
+    nbr[k, RIGHT] = k + 1
+    nbr[k + 1, LEFT] = k
+    # and vertical neighbours are consecutive once sorted by column
+    order = np.lexsort((islands[:, 0], islands[:, 1])).astype(np.int32)
+    k = np.flatnonzero(islands[order[1:], 1] == islands[order[:-1], 1])
+    nbr[order[k], DOWN] = order[k + 1]
+    nbr[order[k + 1], UP] = order[k]
+    return nbr
 
 
-def find_moves(board):
+def find_moves(nbr):
+    # one move per neighbouring pair (i < j); edge_of[k, d] is the move joining k to nbr[k, d]
     moves = []
-    rows, cols = board.shape
-    for i in range(rows):
-        for j in range(cols):
-            cell = board[i, j]
-            if cell.is_island:
-                # horizontal neighbors
-                for k in range(j-1, -1, -1):
-                    if board[i, k].is_island:
-                        moves.append((cell, board[i, k])); break
-                for k in range(j+1, cols):
-                    if board[i, k].is_island:
-                        moves.append((cell, board[i, k])); break
-                # vertical neighbors
-                for k in range(i-1, -1, -1):
-                    if board[k, j].is_island:
-                        moves.append((cell, board[k, j])); break
-                for k in range(i+1, rows):
-                    if board[k, j].is_island:
-                        moves.append((cell, board[k, j])); break
-    return moves
-
-
-def solve(board):
-    candidates = find_moves(board)
-    for perm in permutations(candidates):
-        b = copy.deepcopy(board)
-        ok = True
-        for i1, i2 in perm:
-            # determine existing bridges count for this pair
-            if i1.row == i2.row:
-                existing = b[i1.row, i1.col + (1 if i1.col < i2.col else -1)].bridges
+    edge_of = np.full(nbr.shape, -1, dtype=np.int32)
+    for i in range(len(nbr)):
+        for d in range(4):
+            j = nbr[i, d]
+            if j > i:
+                edge_of[i, d] = edge_of[j, d ^ 1] = len(moves)
+                moves.append((i, j))
+    return np.array(moves, dtype=np.int32).reshape(-1, 2), edge_of
+
+
+@njit(cache=True, nogil=True)
+def _segment_count_nb(bridges, r1, c1, r2, c2):
+    # number of bridges already drawn between two neighbouring islands
+    if r1 == r2:
+        return bridges[r1, c1 + (1 if c1 < c2 else -1)]
+    return bridges[r1 + (1 if r1 < r2 else -1), c1]
+
+
+@njit(cache=True, nogil=True)
+def _try_place_nb(value, bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2):
+    # add one bridge if both islands have capacity and nothing crosses it
+    if bridges[r1, c1] >= value[r1, c1] or bridges[r2, c2] >= value[r2, c2]:
+        return False
+    existing = _segment_count_nb(bridges, r1, c1, r2, c2)
+    if existing >= MAX_BRIDGES or not _check_clear_nb(row_v, col_h, r1, c1, r2, c2):
+        return False
+    _connect_nb(bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2)
+    return True
+
+
+@njit(cache=True, nogil=True)
+def _slack_nb(islands, value, bridges, k):
+    r, c = islands[k, 0], islands[k, 1]
+    return value[r, c] - bridges[r, c]
+
+
+@njit(cache=True, nogil=True)
+def _room_nb(islands, value, bridges, nbr, edge_of, decided, k):
+    # most bridges island k could still get from its undecided moves
+    room = 0
+    for d in range(4):
+        e = edge_of[k, d]
+        if e >= 0 and not decided[e]:
+            room += min(MAX_BRIDGES, _slack_nb(islands, value, bridges, nbr[k, d]))
+    return room
+
+
+@njit(cache=True, nogil=True)
+def _forward_check_nb(islands, value, bridges, nbr, edge_of, decided, k):
+    # island k's missing bridges must fit in its moves still to be decided
+    return _slack_nb(islands, value, bridges, k) <= _room_nb(islands, value, bridges, nbr, edge_of, decided, k)
+
+
+@njit(cache=True, nogil=True)
+def _is_dead_nb(dead, key):
+    return dead[key & (dead.shape[0] - 1)] == key
+
+
+@njit(cache=True, nogil=True)
+def _select_move_nb(islands, value, bridges, nbr, edge_of, decided):
+    # MRV: take the island with the least room to spare (room - slack) among those with
+    # undecided moves, then its move towards the neighbour with the least slack; -1 when all decided
+    best_k, best_t = -1, 0
+    for k in range(islands.shape[0]):
+        has_open = False
+        for d in range(4):
+            e = edge_of[k, d]
+            if e >= 0 and not decided[e]:
+                has_open = True
+        if not has_open:
+            continue
+        t = _room_nb(islands, value, bridges, nbr, edge_of, decided, k) - _slack_nb(islands, value, bridges, k)
+        if best_k < 0 or t < best_t:
+            best_k, best_t = k, t
+    if best_k < 0:
+        return -1
+    best_e, best_s = -1, 0
+    for d in range(4):
+        e = edge_of[best_k, d]
+        if e >= 0 and not decided[e]:
+            s = _slack_nb(islands, value, bridges, nbr[best_k, d])
+            if best_e < 0 or s < best_s:
+                best_e, best_s = e, s
+    return best_e
+
+
+@njit(cache=True, nogil=True)
+def _is_winner_nb(islands, value, bridges):
+    # islands: (n, 2) coordinates of every island, stops at the first one not yet full
+    for k in range(islands.shape[0]):
+        r, c = islands[k, 0], islands[k, 1]
+        if bridges[r, c] != value[r, c]:
+            return False
+    return True
+
+
+@njit(cache=True, nogil=True)
+def _solve_bt_nb(islands, value, bridges, glyph, row_v, col_h, moves, nbr, edge_of, decided, placed, stack,
+                 found, zobrist, edge_keys, state, dead):
+    # iterative backtracking over the undecided moves (pairs of island indices), chosen by
+    # _select_move_nb; stack[depth] is the move decided at that depth and placed[e] the bridges
+    # drawn for move e, tried from the most that fit down to the fewest the forward check allows
+    # gives up as soon as another worker raises found[0]
+    # state[0] hashes the bridges on the board and state[1] the set of decided moves; dead is a
+    # direct-mapped table of state[0] ^ state[1] for nodes already searched without success
+    slot_mask = dead.shape[0] - 1
+    depth = 0
+    descend = True
+    while depth >= 0:
+        if found[0] != 0:
+            return False
+        if descend:
+            key = state[0] ^ state[1]
+            e = -1
+            if not _is_dead_nb(dead, key):
+                e = _select_move_nb(islands, value, bridges, nbr, edge_of, decided)
+                if e < 0 and _is_winner_nb(islands, value, bridges):
+                    found[0] = 1
+                    return True
+            if e < 0:
+                dead[key & slot_mask] = key
+                depth -= 1
+                descend = False
+                continue
+            a, b = moves[e, 0], moves[e, 1]
+            r1, c1, r2, c2 = islands[a, 0], islands[a, 1], islands[b, 0], islands[b, 1]
+            placed[e] = 0
+            while placed[e] < MAX_BRIDGES and _try_place_nb(value, bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2):
+                placed[e] += 1
+            decided[e] = True
+            state[1] ^= edge_keys[e]
+            stack[depth] = e
+        else:
+            e = stack[depth]
+            a, b = moves[e, 0], moves[e, 1]
+            r1, c1, r2, c2 = islands[a, 0], islands[a, 1], islands[b, 0], islands[b, 1]
+            if placed[e] > 0:
+                _undo_nb(bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2)
+                placed[e] -= 1
             else:
-                existing = b[i1.row + (1 if i1.row < i2.row else -1), i1.col].bridges
-            if not check_clear(b, i1, i2, existing):
-                ok = False
-                break
-            connect(b, i1, i2)
-        if ok:
-            return b
+                e = -1
+        # fewer bridges only leaves the endpoints needing more, so once the check fails we are done here
+        if e >= 0 and (_forward_check_nb(islands, value, bridges, nbr, edge_of, decided, a)
+                       and _forward_check_nb(islands, value, bridges, nbr, edge_of, decided, b)):
+            depth += 1
+            descend = True
+            continue
+        e = stack[depth]
+        a, b = moves[e, 0], moves[e, 1]
+        r1, c1, r2, c2 = islands[a, 0], islands[a, 1], islands[b, 0], islands[b, 1]
+        for _ in range(placed[e]):
+            _undo_nb(bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2)
+        placed[e] = 0
+        decided[e] = False
+        state[1] ^= edge_keys[e]
+        key = state[0] ^ state[1]
+        dead[key & slot_mask] = key
+        depth -= 1
+        descend = False
+    return False
+
+
+@njit(cache=True, nogil=True)
+def _solve_subtree_nb(islands, value, bridges, glyph, row_v, col_h, moves, nbr, edge_of, decided, placed, stack,
+                      prefix, found, zobrist, edge_keys, state, dead):
+    # fix the bridge counts of the first len(prefix) moves, then search the rest
+    for e in range(prefix.shape[0]):
+        a, b = moves[e, 0], moves[e, 1]
+        r1, c1, r2, c2 = islands[a, 0], islands[a, 1], islands[b, 0], islands[b, 1]
+        for _ in range(prefix[e]):
+            if not _try_place_nb(value, bridges, glyph, row_v, col_h, zobrist, state, r1, c1, r2, c2):
+                return False
+        placed[e] = prefix[e]
+        decided[e] = True
+        state[1] ^= edge_keys[e]
+        if not (_forward_check_nb(islands, value, bridges, nbr, edge_of, decided, a)
+                and _forward_check_nb(islands, value, bridges, nbr, edge_of, decided, b)):
+            return False
+    return _solve_bt_nb(islands, value, bridges, glyph, row_v, col_h, moves, nbr, edge_of, decided, placed, stack,
+                        found, zobrist, edge_keys, state, dead)
+
+
+def crossing_masks(glyph):
+    # bitsets of the cells crossed by vertical bridges (per row) and horizontal bridges (per column)
+    rows, cols = glyph.shape
+    row_v = np.zeros((rows, (cols + 63) // 64), dtype=np.uint64)
+    col_h = np.zeros((cols, (rows + 63) // 64), dtype=np.uint64)
+    for r, c in np.argwhere(np.isin(glyph, V_GLYPH[1:])):
+        _set_bit_nb(row_v, r, c, True)
+    for r, c in np.argwhere(np.isin(glyph, H_GLYPH[1:])):
+        _set_bit_nb(col_h, c, r, True)
+    return row_v, col_h
+
+
+def solve(is_island, value, bridges, glyph, workers=None):
+    islands = np.argwhere(is_island).astype(np.int32)
+    nbr = find_neighbors(islands)
+    candidates, edge_of = find_moves(nbr)
+    workers = workers or os.cpu_count() or 1
+    # split the root on the first few moves so there is at least one subtree per worker
+    depth = 0
+    while depth < len(candidates) and (MAX_BRIDGES + 1) ** depth < workers:
+        depth += 1
+    found = np.zeros(1, dtype=np.int32)
+    # zobrist[r, c, o, k]: key for k bridges crossing (r, c), o = 0 horizontal / 1 vertical
+    rng = np.random.default_rng()
+    zobrist = rng.integers(0, 2**63, size=is_island.shape + (2, MAX_BRIDGES + 1), dtype=np.uint64)
+    zobrist[:, :, :, 0] = 0
+    edge_keys = rng.integers(0, 2**63, size=len(candidates), dtype=np.uint64)
+    # nonzero start for the decided-move hash, 0 marks an empty slot in the dead table
+    root_key = rng.integers(1, 2**63, dtype=np.uint64)
+
+    def run(prefix):
+        b, g = bridges.copy(), glyph.copy()
+        row_v, col_h = crossing_masks(g)
+        decided = np.zeros(len(candidates), dtype=np.bool_)
+        placed = np.zeros(len(candidates), dtype=np.int32)
+        stack = np.empty(len(candidates), dtype=np.int32)
+        prefix = np.array(prefix, dtype=np.int32)
+        state = np.array([0, root_key], dtype=np.uint64)
+        dead = np.zeros(DEAD_SLOTS, dtype=np.uint64)
+        if _solve_subtree_nb(islands, value, b, g, row_v, col_h, candidates, nbr, edge_of, decided, placed, stack,
+                             prefix, found, zobrist, edge_keys, state, dead):
+            return b, g
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(run, product(range(MAX_BRIDGES + 1), repeat=depth)):
+            if result is not None:
+                return result
     return None
 
 
-def print_solution(board):
-    for row in board:
-        print(''.join(str(cell.value) for cell in row))
+def print_solution(is_island, value, glyph):
+    for land, caps, codes in zip(is_island.tolist(), value.tolist(), glyph.tolist()):
+        print(''.join('0123456789abc'[v] if isl else CODE_TO_CHAR[g]
+                      for isl, v, g in zip(land, caps, codes)))
 
 
 if __name__ == '__main__':
-    board = read_board_stdin()
-    solution = solve(board)
+    is_island, value, bridges, glyph = read_board_stdin()
+    solution = solve(is_island, value, bridges, glyph)
     if solution is None:
         print('No solution')
     else:
-        print_solution(solution)
-
+        print_solution(is_island, value, solution[1])
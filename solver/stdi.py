@@ -1,9 +1,12 @@
 import numpy as np
-import copy
 import sys
-from itertools import permutations
-from collections import deque
-import heapq
+
+# codes for what is drawn on a water cell, only turned into characters when printing
+EMPTY, H1, H2, H3, V1, V2, V3 = 0, 1, 2, 3, 4, 5, 6
+CODE_TO_CHAR = '.-=E|"#'
+# code for a horizontal / vertical segment indexed by its bridge count
+H_GLYPH = (EMPTY, H1, H2, H3)
+V_GLYPH = (EMPTY, V1, V2, V3)
 
 class Island:
     def __init__(self, row, col, is_island, value, bridges=0):
@@ -13,143 +16,172 @@ class Island:
         self.value = value
         self.bridges = bridges
 
-    def __lt__(self, other):
-        return self.value > other.value
+
+def expand_grid(grid):
+    # add an empty row / column between every pair of touching islands so a bridge fits
+    # grid holds island values with -1 for water; rows and columns are placed in one scatter
+    land = grid >= 0
+    row_gap = (land[:-1] & land[1:]).any(axis=1)
+    col_gap = (land[:, :-1] & land[:, 1:]).any(axis=0)
+    row_map = np.arange(grid.shape[0]) + np.concatenate(([0], np.cumsum(row_gap)))
+    col_map = np.arange(grid.shape[1]) + np.concatenate(([0], np.cumsum(col_gap)))
+    expanded = np.full((row_map[-1] + 1, col_map[-1] + 1), -1, dtype=grid.dtype)
+    expanded[np.ix_(row_map, col_map)] = grid
+    return expanded
 
 
 def read_board_stdin():
     lines = [line.rstrip('\n') for line in sys.stdin if line.strip()]
-    n = len(lines)
-    m = len(lines[0]) if n else 0
-    temp = []
     mapping = {'a': 10, 'b': 11, 'c': 12}
-    for i, line in enumerate(lines):
+    grid = []
+    for line in lines:
         row = []
-        for j, ch in enumerate(line):
+        for ch in line:
             if ch == '.':
-                row.append(Island(i, j, False, '.'))
+                row.append(-1)
+            elif ch.isdigit():
+                row.append(int(ch))
+            elif ch in mapping:
+                row.append(mapping[ch])
             else:
-                if ch.isdigit():
-                    val = int(ch)
-                elif ch in mapping:
-                    val = mapping[ch]
-                else:
-                    raise ValueError(f"Invalid character: {ch}")
-                row.append(Island(i, j, True, val))
-        temp.append(row)
-    expanded = []
-    for i in range(n):
-        expanded.append(temp[i])
-        for j in range(m):
-            if i < n-1 and temp[i][j].is_island and temp[i+1][j].is_island:
-                gap = [Island(i, j, False, '.') for _ in range(m)]
-                expanded.append(gap)
-                break
-    for i in range(len(expanded)):
-        for j in range(len(expanded[0]) - 1):
-            if expanded[i][j].is_island and expanded[i][j+1].is_island:
-                for row in expanded:
-                    row.insert(j+1, Island(i, j, False, '.'))
-                break
-    board = np.array(expanded)
-    update_positions(board)
+                raise ValueError(f"Invalid character: {ch}")
+        grid.append(row)
+    grid = expand_grid(np.array(grid, dtype=np.int8))
+    rows, cols = grid.shape
+    # islands are built at their final position, so row / col never need fixing up
+    board = np.empty((rows, cols), dtype=object)
+    for i, row in enumerate(grid.tolist()):
+        for j, v in enumerate(row):
+            board[i, j] = Island(i, j, True, v) if v >= 0 else Island(i, j, False, EMPTY)
     return board
 
 
-def update_positions(board):
-    rows, cols = board.shape
-    for i in range(rows):
-        for j in range(cols):
-            board[i, j].row = i
-            board[i, j].col = j
-
-
 def check_clear(board, i1, i2, existing):
     # existing: number of bridges already present between these islands
-    if i1.row == i2.row:
-        step = 1 if i1.col < i2.col else -1
-        sym = {1: '-', 2: '=', 3: 'E'}.get(existing, None)
-        for c in range(i1.col+step, i2.col, step):
-            if board[i1.row, c].value not in ('.', sym):
+    r1, c1, r2, c2 = i1.row, i1.col, i2.row, i2.col
+    if r1 == r2:
+        step = 1 if c1 < c2 else -1
+        sym = H_GLYPH[existing]
+        line = board[r1]
+        for c in range(c1+step, c2, step):
+            v = line[c].value
+            if v != EMPTY and v != sym:
                 return False
         return True
-    if i1.col == i2.col:
-        step = 1 if i1.row < i2.row else -1
-        sym = {1: '|', 2: '║', 3: 'E'}.get(existing, None)
-        for r in range(i1.row+step, i2.row, step):
-            if board[r, i1.col].value not in ('.', sym):
+    if c1 == c2:
+        step = 1 if r1 < r2 else -1
+        sym = V_GLYPH[existing]
+        line = board[:, c1]
+        for r in range(r1+step, r2, step):
+            v = line[r].value
+            if v != EMPTY and v != sym:
                 return False
         return True
     return False
 
 
-def connect(board, i1, i2):
-    # draw one more bridge segment and symbol
-    if i1.row == i2.row:
-        step = 1 if i1.col < i2.col else -1
-        for c in range(i1.col+step, i2.col, step):
-            cell = board[i1.row, c]
-            if cell.bridges < 3:
-                cell.bridges += 1
-                cell.value = {1: '-', 2: '=', 3: 'E'}[cell.bridges]
+def connect(board, i1, i2, log):
+    # draw one more bridge segment and symbol; log gets (cell, old bridges, old value) for every cell changed
+    r1, c1, r2, c2 = i1.row, i1.col, i2.row, i2.col
+    if r1 == r2:
+        step = 1 if c1 < c2 else -1
+        line, glyphs = board[r1], H_GLYPH
+        span = range(c1+step, c2, step)
     else:
-        step = 1 if i1.row < i2.row else -1
-        for r in range(i1.row+step, i2.row, step):
-            cell = board[r, i1.col]
-            if cell.bridges < 3:
-                cell.bridges += 1
-                cell.value = {1: '|', 2: '║', 3: 'E'}[cell.bridges]
-    i1.bridges += 1
-    i2.bridges += 1
+        step = 1 if r1 < r2 else -1
+        line, glyphs = board[:, c1], V_GLYPH
+        span = range(r1+step, r2, step)
+    for k in span:
+        cell = line[k]
+        n = cell.bridges
+        if n < 3:
+            log.append((cell, n, cell.value))
+            cell.bridges = n + 1
+            cell.value = glyphs[n + 1]
+    for isl in (i1, i2):
+        log.append((isl, isl.bridges, isl.value))
+        isl.bridges += 1
+
+
+def undo(log, mark):
+    # put back every cell changed since log had length mark
+    while len(log) > mark:
+        cell, bridges, value = log.pop()
+        cell.bridges = bridges
+        cell.value = value
 
 
 def find_moves(board):
     moves = []
     rows, cols = board.shape
+    # read is_island once per cell instead of once per scan
+    land = [[cell.is_island for cell in row] for row in board]
     for i in range(rows):
+        line, land_i = board[i], land[i]
         for j in range(cols):
-            cell = board[i, j]
-            if cell.is_island:
-                # horizontal neighbors
-                for k in range(j-1, -1, -1):
-                    if board[i, k].is_island:
-                        moves.append((cell, board[i, k])); break
+            if land_i[j]:
+                cell = line[j]
+                # only look right and down so each pair is listed once
                 for k in range(j+1, cols):
-                    if board[i, k].is_island:
-                        moves.append((cell, board[i, k])); break
-                # vertical neighbors
-                for k in range(i-1, -1, -1):
-                    if board[k, j].is_island:
-                        moves.append((cell, board[k, j])); break
+                    if land_i[k]:
+                        moves.append((cell, line[k])); break
                 for k in range(i+1, rows):
-                    if board[k, j].is_island:
+                    if land[k][j]:
                         moves.append((cell, board[k, j])); break
     return moves
 
 
+def heap_permutations(n):
+    # Heap's algorithm: each ordering of range(n) is one swap away from the last, so the same
+    # list is permuted in place; also yields the first position that changed
+    order = list(range(n))
+    c = [0] * n
+    yield order, 0
+    i = 1
+    while i < n:
+        if c[i] < i:
+            k = 0 if i % 2 == 0 else c[i]
+            order[k], order[i] = order[i], order[k]
+            yield order, k
+            c[i] += 1
+            i = 1
+        else:
+            c[i] = 0
+            i += 1
+
+
 def solve(board):
+    # one working board: marks[p] is the log length before the p-th move of the current
+    # ordering, so a new ordering only undoes and replays from the first position it changed
     candidates = find_moves(board)
-    for perm in permutations(candidates):
-        b = copy.deepcopy(board)
-        ok = True
-        for i1, i2 in perm:
+    n = len(candidates)
+    log = []
+    marks = [0] * (n + 1)
+    applied = 0
+    for order, first in heap_permutations(n):
+        applied = min(applied, first)
+        undo(log, marks[applied])
+        while applied < n:
+            i1, i2 = candidates[order[applied]]
+            r1, c1, r2, c2 = i1.row, i1.col, i2.row, i2.col
             # determine existing bridges count for this pair
-            if i1.row == i2.row:
-                existing = b[i1.row, i1.col + (1 if i1.col < i2.col else -1)].bridges
+            if r1 == r2:
+                existing = board[r1, c1 + (1 if c1 < c2 else -1)].bridges
             else:
-                existing = b[i1.row + (1 if i1.row < i2.row else -1), i1.col].bridges
-            if not check_clear(b, i1, i2, existing):
-                ok = False
+                existing = board[r1 + (1 if r1 < r2 else -1), c1].bridges
+            if not check_clear(board, i1, i2, existing):
                 break
-            connect(b, i1, i2)
-        if ok:
-            return b
+            connect(board, i1, i2, log)
+            applied += 1
+            marks[applied] = len(log)
+        if applied == n:
+            return board
     return None
 
 
 def print_solution(board):
     for row in board:
-        print(''.join(str(cell.value) for cell in row))
+        print(''.join(str(cell.value) if cell.is_island else CODE_TO_CHAR[cell.value] for cell in row))
 
 
 if __name__ == '__main__':